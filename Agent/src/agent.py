@@ -1,32 +1,74 @@
 """
 Main AI agent implementation coordinating between different models and tasks.
 """
-from typing import Optional, Dict, Any, List, AsyncGenerator
+from typing import Optional, Dict, Any, Callable, List, Tuple, AsyncGenerator
+import asyncio
+import bisect
+import collections
+import functools
+import itertools
 import logging
 from datetime import datetime, timedelta
 import json
 import re
+import sys
+import time
 
 from chatgpt_agent import ChatGPTAgent
 from o3_mini import O3MiniAgent
-from database import SessionLocal, Conversation, AgentTask, Task, get_tasks_by_urgency, update_task_status, get_task_by_id, update_task_urgency, append_task_notes, create_task, update_task_description, get_events_by_timeframe, create_event, update_event, delete_event
+from database import engine, Conversation, AgentTask, Task, get_all_tasks_prioritized, update_task_status, get_task_by_id, update_task_urgency, append_task_notes, create_task, update_task_description, get_events_by_timeframe, create_event, update_event, delete_event
 from config import (
-    MAX_RETRIES, TIMEOUT, MAX_TOKENS, MAX_EMAILS,
-    URGENCY_ORDER, HALF_FINISHED_PRIORITY
+    MAX_RETRIES, TIMEOUT, MAX_TOKENS, MAX_EMAILS, MAX_CONCURRENT_SUMMARIES,
+    HALF_FINISHED_PRIORITY, FALLBACK_HEDGE_DELAY,
+    RESPONSE_CACHE_SIZE, WRITE_BATCH_SIZE, WRITE_FLUSH_MS,
+    STREAM_FLUSH_INTERVAL, STREAM_FLUSH_CHARS
 )
 from profile_manager import ProfileManager
+from sqlalchemy import Table
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Keywords that route input to the deep thinking model, matched case-insensitively in one pass
+_DEEP_KEYWORDS = frozenset({'analyze', 'compare', 'evaluate', 'synthesize'})
+_DEEP_RE = re.compile(r'\b(?:' + '|'.join(sorted(_DEEP_KEYWORDS)) + r')\w*\b', re.IGNORECASE)
+
+def _greedy_chunk_bounds(sizes: List[int], max_tokens: int, max_emails: int) -> List[int]:
+    """
+    Compute greedy chunk end indices for a sequence of item sizes.
+    
+    Each chunk takes as many consecutive items as fit within max_tokens,
+    at most max_emails and always at least one.
+    
+    Args:
+        sizes: Token size of each item
+        max_tokens: Maximum total size per chunk
+        max_emails: Maximum number of items per chunk
+    
+    Returns:
+        List[int]: Exclusive end index of each chunk
+    """
+    # Running totals, where cumulative[i] is the size of the first i items
+    cumulative = list(itertools.accumulate(sizes, initial=0))
+
+    bounds = []
+    start = 0
+    while start < len(sizes):
+        end = bisect.bisect_right(cumulative, cumulative[start] + max_tokens) - 1
+        end = max(min(end, start + max_emails), start + 1)
+        bounds.append(end)
+        start = end
+    return bounds
+
+def _ctx_key(ctx: Optional[Dict[str, Any]]) -> int:
+    """Hash a context dictionary for use in a response cache key."""
+    return hash(tuple(sorted((k, repr(v)) for k, v in (ctx or {}).items())))
+
 class AIAgent:
     def __init__(self):
-        """Initialize the AI agent with its component models."""
-        self.chatgpt = ChatGPTAgent()
-        self.o3_mini = O3MiniAgent()
+        """Initialize the AI agent. Component models are created on first use."""
         self.last_model_used = "gpt-4"  # Default to GPT-4
-        self.db = None  # Initialize as None
         self.context = {
             "history": [],
             "available_tasks": [],
@@ -34,16 +76,102 @@ class AIAgent:
             "current_task_id": None,
             "current_event_id": None  # Add current event tracking
         }
-        try:
-            self.db = SessionLocal()
-        except Exception as e:
-            logger.error(f"Failed to initialize database: {str(e)}")
-
-        # Log availability of models
-        if not self.chatgpt.is_available:
+        # Bound concurrent chunk summaries to respect API rate limits
+        self._summary_semaphore = asyncio.Semaphore(MAX_CONCURRENT_SUMMARIES)
+        # Responses to non-conversational inputs, least recently used first
+        self._resp_cache = collections.OrderedDict()
+        # Background writer for per-turn log rows, started on first write
+        self._write_queue = None
+        self._writer_task = None
+
+    @functools.cached_property
+    def chatgpt(self) -> ChatGPTAgent:
+        """The ChatGPT model, created on first use."""
+        chatgpt = ChatGPTAgent()
+        if not chatgpt.is_available:
             logger.warning("ChatGPT model is not available")
-        if not self.o3_mini.is_available:
+        return chatgpt
+
+    @functools.cached_property
+    def o3_mini(self) -> O3MiniAgent:
+        """The O3-mini model, created on first use."""
+        o3_mini = O3MiniAgent()
+        if not o3_mini.is_available:
             logger.warning("O3-mini model is not available")
+        return o3_mini
+
+    def _queue_write(self, table: Table, row: Dict[str, Any]) -> None:
+        """
+        Queue a row for the background writer, starting it if needed.
+        
+        Args:
+            table: The table to insert into
+            row: Column values for the new row
+        """
+        loop = asyncio.get_running_loop()
+        if self._writer_task is None or self._writer_task.done() or self._writer_task.get_loop() is not loop:
+            # Carry over rows the previous writer never got to, e.g. when its event loop has ended
+            pending = self._write_queue
+            self._write_queue = asyncio.Queue()
+            if pending is not None and not pending.empty():
+                logger.warning("Moving %s unwritten rows to a new background writer", pending.qsize())
+                while not pending.empty():
+                    self._write_queue.put_nowait(pending.get_nowait())
+            self._writer_task = loop.create_task(self._writer_loop(self._write_queue))
+        self._write_queue.put_nowait((table, row))
+
+    async def _writer_loop(self, queue: asyncio.Queue) -> None:
+        """
+        Write queued rows to the database in batches.
+        
+        Each batch holds up to WRITE_BATCH_SIZE rows gathered within
+        WRITE_FLUSH_MS of the first one, and is committed in one transaction.
+        
+        Args:
+            queue: Queue of (table, row) writes
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + WRITE_FLUSH_MS / 1000
+            try:
+                while len(batch) < WRITE_BATCH_SIZE:
+                    try:
+                        batch.append(await asyncio.wait_for(queue.get(), deadline - loop.time()))
+                    except asyncio.TimeoutError:
+                        break
+            except asyncio.CancelledError:
+                # Hand the unwritten batch back, in order, so the next writer picks it up
+                while not queue.empty():
+                    batch.append(queue.get_nowait())
+                for write in batch:
+                    queue.put_nowait(write)
+                    queue.task_done()
+                raise
+
+            try:
+                await asyncio.to_thread(self._write_rows, batch)
+            except Exception as e:
+                logger.error("Error writing %s queued rows: %s", len(batch), e)
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
+    @staticmethod
+    def _write_rows(batch: List[Tuple[Table, Dict[str, Any]]]) -> None:
+        """
+        Insert a batch of rows with one statement per table in a single transaction.
+        
+        Args:
+            batch: List of (table, row) writes
+        """
+        rows_by_table = {}
+        for table, row in batch:
+            rows_by_table.setdefault(table, []).append(row)
+
+        with engine.begin() as conn:
+            for table, rows in rows_by_table.items():
+                conn.execute(table.insert(), rows)
 
     async def process_input(self, user_input: str, context: Optional[Dict[str, Any]] = None) -> AsyncGenerator[str, None]:
         """
@@ -71,6 +199,20 @@ class AIAgent:
             raise RuntimeError("No AI models are available.")
 
         try:
+            # Answer a repeated request before any profile or model work.
+            # Greetings, task turns and chat turns with history are never cached.
+            cache_key = None
+            ctx = context or {}
+            if not (ctx.get('is_greeting') or 'tasks' in ctx or ctx.get('history')):
+                cache_key = (user_input, _ctx_key(context))
+
+            if cache_key in self._resp_cache:
+                self._resp_cache.move_to_end(cache_key)
+                response, self.last_model_used = self._resp_cache[cache_key]
+                yield response
+                self._queue_turn(user_input, response)
+                return
+
             # Process input for profile insights first
             learned_something = False
             profile_insight = None
@@ -82,7 +224,7 @@ class AIAgent:
                     if context is None:
                         context = {}
                     context['profile'] = profile
-                    logger.info(f"Updated user profile from conversation: {insight}")
+                    logger.info("Updated user profile from conversation: %s", insight)
                     learned_something = True
                     profile_insight = insight
 
@@ -148,81 +290,174 @@ class AIAgent:
                     yield f"\n\nBy the way, I noticed something about you, and saved it to my memory to improve our interactions: {profile_insight}"
                 return
 
-            # Create a new conversation entry
-            task = AgentTask(
-                task_type="process_input",
-                status="in_progress"
-            )
-            self.db.add(task)
-            self.db.commit()
-
-            # Determine which model to use
+            # Determine which model to use, with the other one as fallback.
+            # The fallback is only created if it is actually needed.
             use_o3_mini = (
-                self.o3_mini.is_available and 
-                self._requires_deep_thinking(user_input)
-            )
+                self._requires_deep_thinking(user_input) and
+                self.o3_mini.is_available
+            ) or not self.chatgpt.is_available
+            models = [(lambda: self.o3_mini, "o3-mini"), (lambda: self.chatgpt, "gpt-4")]
+            if not use_o3_mini:
+                models.reverse()
 
-            response_chunks = []
             try:
-                if use_o3_mini:
-                    self.last_model_used = "o3-mini"
-                    async for chunk in self.o3_mini.process(user_input, context):
-                        response_chunks.append(chunk)
-                        yield chunk
-                else:
-                    if not self.chatgpt.is_available:
-                        raise RuntimeError("ChatGPT is not available and this input requires it")
-                    self.last_model_used = "gpt-4"
-                    async for chunk in self.chatgpt.process(user_input, context):
-                        response_chunks.append(chunk)
-                        yield chunk
-
-                # If we learned something about the user, mention it naturally after the response
-                if learned_something and profile_insight:
-                    yield f"\n\nBy the way, I noticed something about you: {profile_insight}"
-
+                response, self.last_model_used = await self._run_with_fallback(user_input, context, models)
             except Exception as model_error:
-                # If primary model fails, try fallback to the other model
-                logger.warning(f"Primary model failed: {str(model_error)}")
-                response_chunks = []
-                if use_o3_mini and self.chatgpt.is_available:
-                    logger.info("Falling back to ChatGPT")
-                    self.last_model_used = "gpt-4"
-                    async for chunk in self.chatgpt.process(user_input, context):
-                        response_chunks.append(chunk)
-                        yield chunk
-                elif not use_o3_mini and self.o3_mini.is_available:
-                    logger.info("Falling back to O3-mini")
-                    self.last_model_used = "o3-mini"
-                    async for chunk in self.o3_mini.process(user_input, context):
-                        response_chunks.append(chunk)
-                        yield chunk
-                else:
-                    raise
-
-                # If we learned something about the user, mention it naturally after the fallback response
-                if learned_something and profile_insight:
-                    yield f"\n\nBy the way, I noticed something about you: {profile_insight}"
+                self._queue_write(AgentTask.__table__, {
+                    "task_type": "process_input",
+                    "status": "failed",
+                    "result": str(model_error)
+                })
+                raise
 
-            response = "".join(response_chunks)
+            # Keyed on the context as it came in, before any profile update
+            if cache_key is not None:
+                self._resp_cache[cache_key] = (response, self.last_model_used)
+                if len(self._resp_cache) > RESPONSE_CACHE_SIZE:
+                    self._resp_cache.popitem(last=False)
+            yield response
 
-            # Store the conversation
-            conversation = Conversation(
-                user_input=user_input,
-                agent_response=response,
-                model_used=self.last_model_used
-            )
-            self.db.add(conversation)
+            # If we learned something about the user, mention it naturally after the response
+            if learned_something and profile_insight:
+                yield f"\n\nBy the way, I noticed something about you: {profile_insight}"
 
-            # Update task status
-            task.status = "completed"
-            task.result = response
-            self.db.commit()
+            self._queue_turn(user_input, response)
 
         except Exception as e:
-            logger.error(f"Error processing input: {str(e)}")
+            logger.error("Error processing input: %s", e)
             raise
 
+    def _queue_turn(self, user_input: str, response: str) -> None:
+        """
+        Queue the log rows for a completed process_input turn.
+        
+        Args:
+            user_input: The user's input text
+            response: The agent's complete response
+        """
+        # The background writer commits the conversation and its task in bulk
+        self._queue_write(Conversation.__table__, {
+            "user_input": user_input,
+            "agent_response": response,
+            "model_used": self.last_model_used
+        })
+        self._queue_write(AgentTask.__table__, {
+            "task_type": "process_input",
+            "status": "completed",
+            "result": response
+        })
+
+    async def _run_model(self, model: Any, user_input: str, context: Optional[Dict[str, Any]], started: asyncio.Event) -> str:
+        """
+        Run a model to completion and return its full response.
+        
+        Args:
+            model: The ChatGPTAgent or O3MiniAgent to run
+            user_input: The user's input text
+            context: Optional context dictionary
+            started: Event set once the model yields its first chunk
+        
+        Returns:
+            str: The complete response
+        """
+        chunks = []
+        async for chunk in model.process(user_input, context):
+            started.set()
+            chunks.append(chunk)
+        return "".join(chunks)
+
+    async def aclose(self) -> None:
+        """Flush queued writes, then stop the background writer."""
+        writer = self._writer_task
+        if writer is not None and not writer.done() and writer.get_loop() is asyncio.get_running_loop():
+            await self._write_queue.join()
+
+        if writer is not None and not writer.done():
+            writer.cancel()
+        self._writer_task = None
+
+    async def _run_with_fallback(self, user_input: str, context: Optional[Dict[str, Any]], models: List[Tuple[Any, str]]) -> Tuple[str, str]:
+        """
+        Run the primary model, starting the fallback if it fails.
+        
+        Models are given as getters so that the fallback is only created if
+        it is started, and it is skipped if it turns out to be unavailable.
+        The fallback is started as soon as the primary raises or returns an
+        empty response. If FALLBACK_HEDGE_DELAY is set, the fallback is also
+        started when the primary has not produced its first chunk within that
+        many seconds; the first model to return a response then wins and the
+        other is cancelled. Hedging is off by default because o3-mini often
+        takes longer than a short delay to produce its first chunk.
+        
+        Args:
+            user_input: The user's input text
+            context: Optional context dictionary
+            models: (model getter, name) pairs, primary first and optional fallback second
+        
+        Returns:
+            Tuple[str, str]: The complete response and the name of the model that produced it
+        
+        Raises:
+            Exception: The last model error if every model failed
+                without any returning an empty response
+        """
+        fallback = models[1] if len(models) > 1 else None
+        runs = {}
+
+        def launch(get_model: Callable[[], Any], name: str, started: asyncio.Event) -> Optional[asyncio.Task]:
+            model = get_model()
+            if not model.is_available:
+                logger.warning("Skipping %s, it is not available", name)
+                return None
+            run = asyncio.create_task(self._run_model(model, user_input, context, started))
+            runs[run] = name
+            return run
+
+        primary_name = models[0][1]
+        primary_started = asyncio.Event()
+        primary_run = asyncio.create_task(self._run_model(models[0][0](), user_input, context, primary_started))
+        runs[primary_run] = primary_name
+        started_wait = None
+        try:
+            if fallback and FALLBACK_HEDGE_DELAY > 0:
+                started_wait = asyncio.create_task(primary_started.wait())
+                await asyncio.wait({primary_run, started_wait}, timeout=FALLBACK_HEDGE_DELAY, return_when=asyncio.FIRST_COMPLETED)
+                if not primary_started.is_set() and not primary_run.done():
+                    logger.info("%s has not responded yet, starting %s speculatively", primary_name, fallback[1])
+                    launch(*fallback, asyncio.Event())
+                    fallback = None
+
+            empty_result = None
+            last_error = None
+            while runs:
+                done, _ = await asyncio.wait(runs, return_when=asyncio.FIRST_COMPLETED)
+                for run in done:
+                    name = runs.pop(run)
+                    if run.exception() is not None:
+                        last_error = run.exception()
+                        logger.warning("Model %s failed: %s", name, last_error)
+                    elif run.result():
+                        return run.result(), name
+                    else:
+                        empty_result = (run.result(), name)
+                        logger.warning("Model %s returned an empty response", name)
+
+                    if fallback:
+                        logger.info("Falling back to %s", fallback[1])
+                        launch(*fallback, asyncio.Event())
+                        fallback = None
+
+            if empty_result is not None:
+                return empty_result
+            raise last_error
+
+        finally:
+            # Cancel the first-chunk wait and whichever model lost the race
+            if started_wait is not None:
+                started_wait.cancel()
+            for run in runs:
+                run.cancel()
+
     def _requires_deep_thinking(self, input_text: str) -> bool:
         """
         Determine if the input requires the O3-mini model for deep thinking.
@@ -235,8 +470,7 @@ class AIAgent:
         """
         # Add logic to determine which model to use
         # This is a simple implementation that can be enhanced
-        deep_thinking_keywords = {'analyze', 'compare', 'evaluate', 'synthesize'}
-        return any(keyword in input_text.lower() for keyword in deep_thinking_keywords)
+        return _DEEP_RE.search(input_text) is not None
 
     async def get_task_count(self) -> int:
         """
@@ -246,21 +480,10 @@ class AIAgent:
             int: The number of active tasks
         """
         try:
-            count = 0
-            for urgency in URGENCY_ORDER:
-                tasks = get_tasks_by_urgency(urgency)
-                if tasks:
-                    count += len(tasks)
-                
-                # Include half-finished tasks in the count
-                if urgency == HALF_FINISHED_PRIORITY:
-                    half_finished = [t for t in tasks if t.get('status') == 'half-completed']
-                    count += len(half_finished)
-            
-            return count
+            return len(get_all_tasks_prioritized(HALF_FINISHED_PRIORITY))
             
         except Exception as e:
-            logger.error(f"Error getting task count: {str(e)}")
+            logger.error("Error getting task count: %s", e)
             raise
 
     async def get_tasks(self) -> List[dict]:
@@ -271,26 +494,35 @@ class AIAgent:
             List[dict]: List of all tasks and information items
         """
         try:
-            all_items = []
-            for urgency in URGENCY_ORDER:
-                items = get_tasks_by_urgency(urgency)
-                if items:  # Only extend if we got items
-                    # Filter out completed tasks
-                    active_items = [item for item in items if item.get('status') != 'completed']
-                    all_items.extend(active_items)
-
-                # Handle half-finished tasks with special priority
-                if urgency == HALF_FINISHED_PRIORITY:
-                    half_finished = [t for t in items if t.get('status') == 'half-completed']
-                    if half_finished:
-                        all_items.extend(half_finished)
-
-            return all_items
+            # Completed tasks are filtered out and half-finished tasks prioritized by the query
+            return get_all_tasks_prioritized(HALF_FINISHED_PRIORITY)
 
         except Exception as e:
-            logger.error(f"Error retrieving tasks: {str(e)}")
+            logger.error("Error retrieving tasks: %s", e)
             raise
 
+    @staticmethod
+    def _task_tokens(task: dict) -> int:
+        """
+        Estimate the token count of a task as formatted for summarization.
+        
+        Only the fields emitted by _format_tasks_for_summary are measured,
+        plus a fixed allowance for the labels, at roughly 4 characters per token.
+        
+        Args:
+            task: Task dictionary
+        
+        Returns:
+            int: Rough estimate of tokens
+        """
+        return (
+            len(task.get('description') or '')
+            + len(task.get('status') or '')
+            + len(str(task.get('urgency', '')))
+            + len(str(task.get('alertAt') or ''))
+            + 24
+        ) >> 2
+
     def _chunk_tasks(self, tasks: List[dict]) -> List[List[dict]]:
         """
         Split tasks into chunks based on MAX_TOKENS or MAX_EMAILS.
@@ -301,28 +533,56 @@ class AIAgent:
         Returns:
             List of task chunks
         """
-        chunks = []
-        current_chunk = []
-        current_size = 0
-
-        for task in tasks:
-            # Estimate token count (rough approximation)
-            task_size = len(str(task)) // 4  # Rough estimate of tokens
-            
-            if (len(current_chunk) >= MAX_EMAILS or 
-                current_size + task_size > MAX_TOKENS):
-                if current_chunk:  # Don't add empty chunks
-                    chunks.append(current_chunk)
-                current_chunk = [task]
-                current_size = task_size
-            else:
-                current_chunk.append(task)
-                current_size += task_size
-
-        if current_chunk:  # Add the last chunk if not empty
-            chunks.append(current_chunk)
+        sizes = [self._task_tokens(task) for task in tasks]
+        bounds = _greedy_chunk_bounds(sizes, MAX_TOKENS, MAX_EMAILS)
+        return [tasks[start:end] for start, end in zip([0] + bounds, bounds)]
+
+    def _format_tasks_for_summary(self, tasks: List[dict]) -> str:
+        """Format a chunk of tasks for the summarization prompt."""
+        return "\n".join(
+            f"Task {t['id']}: {t['description']}\nUrgency: {t['urgency']}\nStatus: {t['status']}"
+            + (f"\nAlert At: {t['alertAt']}" if t.get('alertAt') else "")
+            for t in tasks
+        )
+
+    async def _summarize_chunk(self, chunk: List[dict]) -> str:
+        """
+        Summarize a single chunk of tasks.
+        
+        Args:
+            chunk: List of task dictionaries
+        
+        Returns:
+            str: The complete summary for the chunk
+        """
+        chunk_text = self._format_tasks_for_summary(chunk)
+        async with self._summary_semaphore:
+            pieces = []
+            async for piece in self.chatgpt.summarize_tasks(chunk_text):
+                pieces.append(piece)
+        return "".join(pieces)
+
+    async def summarize_tasks(self, tasks: List[dict]) -> List[str]:
+        """
+        Summarize tasks chunk by chunk.
+        
+        Chunks are independent, so their requests are issued concurrently
+        and the results returned in chunk order.
+        
+        Args:
+            tasks: List of task dictionaries
+        
+        Returns:
+            List[str]: One summary per chunk
+        """
+        try:
+            task_chunks = self._chunk_tasks(tasks)
+            coros = [self._summarize_chunk(chunk) for chunk in task_chunks]
+            return list(await asyncio.gather(*coros))
 
-        return chunks
+        except Exception as e:
+            logger.error("Error summarizing tasks: %s", e)
+            raise
 
     async def present_tasks(self, tasks: List[dict]) -> str:
         """
@@ -383,18 +643,18 @@ class AIAgent:
                 prompt += f"\nThere are also {other_count} other tasks with lower urgency levels that we can look at later.\n"
             
             # Get the AI's response
-            response = ""
+            response_chunks = []
             async for chunk in self.chatgpt.process(prompt, {
                 "role": "task_presenter",
                 "style": "conversational",
                 "focus": "high_priority"
             }):
-                response += chunk
+                response_chunks.append(chunk)
             
-            return response
+            return "".join(response_chunks)
 
         except Exception as e:
-            logger.error(f"Error presenting tasks: {str(e)}")
+            logger.error("Error presenting tasks: %s", e)
             raise
 
     def _format_tasks_for_ai(self, items: List[dict]) -> str:
@@ -493,17 +753,12 @@ class AIAgent:
             
             Make it conversational and encouraging, but keep it concise."""
 
-            # Get the AI's response
-            response = ""
-            print("\nAI: ", end="", flush=True)
-            async for chunk in self.chatgpt.process(task_prompt, {
+            # Stream the AI's response
+            await self._stream_to_stdout(self.chatgpt.process(task_prompt, {
                 "role": "task_helper",
                 "style": "supportive",
                 "focus": "action_oriented"
-            }):
-                response += chunk
-                print(chunk, end="", flush=True)
-            print()  # Add a newline after streaming
+            }))
 
             while True:
                 print("\nWhat would you like to do? You can:")
@@ -520,16 +775,11 @@ class AIAgent:
                 elif action == "1":
                     # Help break down the task
                     breakdown_prompt = f"Help break down this task into manageable steps: {task.get('description')}"
-                    breakdown = ""
-                    print("\nAI: ", end="", flush=True)
-                    async for chunk in self.chatgpt.process(breakdown_prompt, {
+                    await self._stream_to_stdout(self.chatgpt.process(breakdown_prompt, {
                         "role": "task_breakdown",
                         "style": "helpful",
                         "focus": "actionable_steps"
-                    }):
-                        breakdown += chunk
-                        print(chunk, end="", flush=True)
-                    print()  # Add a newline after streaming
+                    }))
                     
                     # Mark as half-completed
                     update_task_status(task_id, 'half-completed', datetime.utcnow())
@@ -575,24 +825,14 @@ class AIAgent:
                     if self._requires_deep_thinking(aspect):
                         print("\nAI: This seems like it needs some careful thought. Would you like me to analyze this deeply? (y/n)")
                         if input().strip().lower() == 'y':
-                            response = ""
-                            print("\nAI: ", end="", flush=True)
-                            async for chunk in self.o3_mini.think_deep(
+                            await self._stream_to_stdout(self.o3_mini.think_deep(
                                 f"Help with this specific aspect of the task: {aspect}\nTask context: {task.get('description')}"
-                            ):
-                                response += chunk
-                                print(chunk, end="", flush=True)
-                            print()  # Add a newline after streaming
+                            ))
                     else:
-                        assistance = ""
-                        print("\nAI: ", end="", flush=True)
-                        async for chunk in self.chatgpt.process(
+                        await self._stream_to_stdout(self.chatgpt.process(
                             f"Provide specific help with this aspect: {aspect}\nTask context: {task.get('description')}",
                             {"role": "specific_helper"}
-                        ):
-                            assistance += chunk
-                            print(chunk, end="", flush=True)
-                        print()  # Add a newline after streaming
+                        ))
                     continue
                     
                 else:
@@ -600,12 +840,42 @@ class AIAgent:
                     continue
 
             # Yield any changes from action processing
-            yield "\n" + response.replace(response, "").strip()
+            yield "\n"
 
         except Exception as e:
-            logger.error(f"Error processing selected task: {str(e)}")
+            logger.error("Error processing selected task: %s", e)
             raise
 
+    async def _stream_to_stdout(self, stream: AsyncGenerator[str, None]) -> None:
+        """
+        Write response chunks to stdout as they arrive.
+        
+        Chunks are coalesced and flushed every STREAM_FLUSH_INTERVAL seconds
+        or STREAM_FLUSH_CHARS characters, rather than once per chunk.
+        
+        Args:
+            stream: The model's response chunks
+        """
+        sys.stdout.write("\nAI: ")
+        sys.stdout.flush()
+
+        pending = []
+        pending_chars = 0
+        last_flush = time.monotonic()
+        async for piece in stream:
+            pending.append(piece)
+            pending_chars += len(piece)
+            if pending_chars > STREAM_FLUSH_CHARS or time.monotonic() - last_flush > STREAM_FLUSH_INTERVAL:
+                sys.stdout.write("".join(pending))
+                sys.stdout.flush()
+                pending.clear()
+                pending_chars = 0
+                last_flush = time.monotonic()
+
+        pending.append("\n")  # Add a newline after streaming
+        sys.stdout.write("".join(pending))
+        sys.stdout.flush()
+
     async def update_task_priority(self, task_id: int, new_urgency: int, reason: str) -> None:
         """
         Update a task's urgency level and add a note explaining why.
@@ -631,10 +901,10 @@ class AIAgent:
             note = f"Urgency changed from {task['urgency']} to {new_urgency}. Reason: {reason}"
             append_task_notes(task_id, note)
             
-            logger.info(f"Updated urgency for task {task_id} to {new_urgency}")
+            logger.info("Updated urgency for task %s to %s", task_id, new_urgency)
             
         except Exception as e:
-            logger.error(f"Error updating task priority: {str(e)}")
+            logger.error("Error updating task priority: %s", e)
             raise
 
     async def add_task_notes(self, task_id: int, notes: str) -> None:
@@ -653,10 +923,10 @@ class AIAgent:
                 raise ValueError(f"Task {task_id} not found")
                 
             append_task_notes(task_id, notes)
-            logger.info(f"Added notes to task {task_id}")
+            logger.info("Added notes to task %s", task_id)
             
         except Exception as e:
-            logger.error(f"Error adding task notes: {str(e)}")
+            logger.error("Error adding task notes: %s", e)
             raise
 
     async def create_new_task(self, description: str, urgency: int, alert_at: Optional[datetime] = None) -> int:
@@ -676,11 +946,11 @@ class AIAgent:
         """
         try:
             task_id = create_task(description, urgency, alert_at=alert_at)
-            logger.info(f"Created new task with ID {task_id}")
+            logger.info("Created new task with ID %s", task_id)
             return task_id
             
         except Exception as e:
-            logger.error(f"Error creating new task: {str(e)}")
+            logger.error("Error creating new task: %s", e)
             raise
 
     async def _identify_task_modification(self, user_input: str, task_id: int) -> Optional[Dict[str, Any]]:
@@ -702,7 +972,7 @@ class AIAgent:
         # Get the current task
         task = get_task_by_id(task_id)
         if not task:
-            logger.warning(f"Task {task_id} not found during modification analysis")
+            logger.warning("Task %s not found during modification analysis", task_id)
             return None
 
         try:
@@ -736,24 +1006,25 @@ class AIAgent:
             If no modifications are suggested, respond with "null".
             """
 
-            modification_json = ""
+            modification_chunks = []
             async for chunk in self.chatgpt.process(analysis_prompt, {"system_role": "task_analyzer"}):
-                modification_json += chunk
+                modification_chunks.append(chunk)
+            modification_json = "".join(modification_chunks)
 
             # Parse the response
             try:
                 modification = json.loads(modification_json.strip())
                 if modification:
-                    logger.info(f"Identified task modification: {modification}")
+                    logger.info("Identified task modification: %s", modification)
                     # Ensure task_id is included
                     modification['task_id'] = task_id
                     return modification
             except json.JSONDecodeError as e:
-                logger.warning(f"Failed to parse modification JSON: {e}")
+                logger.warning("Failed to parse modification JSON: %s", e)
                 return None
 
         except Exception as e:
-            logger.error(f"Error identifying task modification: {str(e)}")
+            logger.error("Error identifying task modification: %s", e)
             return None
 
         return None
@@ -781,7 +1052,7 @@ class AIAgent:
             # Verify task exists
             task = get_task_by_id(task_id)
             if not task:
-                logger.warning(f"Task {task_id} not found during modification")
+                logger.warning("Task %s not found during modification", task_id)
                 return None
 
             response = None
@@ -792,9 +1063,9 @@ class AIAgent:
                         await self.update_task_priority(task_id, urgency, reason)
                         response = f"I've updated the task urgency to {urgency}. {reason}"
                     else:
-                        logger.warning(f"Invalid urgency value: {urgency}")
+                        logger.warning("Invalid urgency value: %s", urgency)
                 except ValueError:
-                    logger.warning(f"Failed to convert urgency value: {value}")
+                    logger.warning("Failed to convert urgency value: %s", value)
             
             elif mod_type == 'status':
                 valid_statuses = {'pending', 'completed', 'half-completed'}
@@ -802,7 +1073,7 @@ class AIAgent:
                     update_task_status(task_id, value, None)
                     response = f"I've marked the task as {value}. {reason}"
                 else:
-                    logger.warning(f"Invalid status value: {value}")
+                    logger.warning("Invalid status value: %s", value)
             
             elif mod_type == 'notes' or mod_type == 'description':  # Handle both notes and description as appends
                 if value.strip():
@@ -818,29 +1089,21 @@ class AIAgent:
                     update_task_status(task_id, task.get('status', 'pending'), alert_time)
                     response = f"I've set a reminder for {alert_time.strftime('%Y-%m-%d %H:%M')}. {reason}"
                 except ValueError as e:
-                    logger.warning(f"Invalid datetime format: {e}")
+                    logger.warning("Invalid datetime format: %s", e)
             else:
-                logger.warning(f"Unknown modification type: {mod_type}")
+                logger.warning("Unknown modification type: %s", mod_type)
 
             if response:
-                logger.info(f"Applied task modification: {mod_type} to task {task_id}")
+                logger.info("Applied task modification: %s to task %s", mod_type, task_id)
                 return response
             else:
-                logger.warning(f"Failed to apply modification: {modification}")
+                logger.warning("Failed to apply modification: %s", modification)
 
         except Exception as e:
-            logger.error(f"Error applying task modification: {str(e)}")
+            logger.error("Error applying task modification: %s", e)
             
         return None
 
-    def __del__(self):
-        """Cleanup resources."""
-        if hasattr(self, 'db') and self.db is not None:
-            try:
-                self.db.close()
-            except Exception as e:
-                logger.error(f"Error closing database connection: {str(e)}")
-
     def _is_action_directive(self, text: str) -> bool:
         """Check if text is part of an action directive."""
         # Patterns for task and profile actions
@@ -891,7 +1154,7 @@ class AIAgent:
                 "user_timezone": "Europe/Dublin"  # Since you're in Ireland
             })
             
-            logger.info(f"Processing input at {current_time.strftime('%Y-%m-%d %H:%M:%S UTC')}")
+            logger.info("Processing input at %s", new_context["current_time_readable"])
             
             # Handle any datetime objects in the context
             def process_context(obj):
@@ -921,8 +1184,8 @@ class AIAgent:
                         yield response
                         return
             
-            # Get response from ChatGPT
-            response = ""
+            # Get response from ChatGPT, collecting its parts to join once at the end
+            response_parts = []
             buffer = ""  # Buffer for accumulating potential action directive text
             
             async for chunk in self.chatgpt.process(user_input, new_context):
@@ -938,7 +1201,7 @@ class AIAgent:
                         
                         if self._is_action_directive(potential_action):
                             # Add to response but don't yield
-                            response += potential_action
+                            response_parts.append(potential_action)
                             # Yield remaining text if any
                             if remaining_text:
                                 yield remaining_text
@@ -953,14 +1216,15 @@ class AIAgent:
                     yield buffer
                     buffer = ""
                 
-                response += chunk
+                response_parts.append(chunk)
             
             # Handle any remaining buffer
             if buffer:
                 if not self._is_action_directive(buffer):
                     yield buffer
                 else:
-                    response += buffer
+                    response_parts.append(buffer)
+            response = "".join(response_parts)
             
             # Extract and handle any actions from the response
             actions = self._extract_actions(response)
@@ -970,7 +1234,7 @@ class AIAgent:
                     yield action_response
 
         except Exception as e:
-            logger.error(f"Error handling input: {str(e)}")
+            logger.error("Error handling input: %s", e)
             raise
 
     async def _discuss_specific_item(self, item: dict) -> AsyncGenerator[str, None]:
@@ -1017,7 +1281,7 @@ class AIAgent:
     def _extract_actions(self, response: str) -> List[dict]:
         """Extract action directives from the AI's response."""
         actions = []
-        logger.info(f"Extracting actions from response: {response}")
+        logger.info("Extracting actions from response: %s", response)
         
         # Match task actions
         task_patterns = [
@@ -1058,7 +1322,7 @@ class AIAgent:
                     'task_id': task_id,
                     'details': details
                 }
-                logger.info(f"Extracted task action: {action}")
+                logger.info("Extracted task action: %s", action)
                 actions.append(action)
         
         # Extract event actions
@@ -1079,7 +1343,7 @@ class AIAgent:
                         'subtype': 'create',
                         'details': match
                     }
-                logger.info(f"Extracted event action: {action}")
+                logger.info("Extracted event action: %s", action)
                 actions.append(action)
         
         # Match profile actions
@@ -1091,7 +1355,7 @@ class AIAgent:
                 'subtype': subtype,
                 'details': details
             }
-            logger.info(f"Extracted profile action: {action}")
+            logger.info("Extracted profile action: %s", action)
             actions.append(action)
         
         return actions
@@ -1100,7 +1364,7 @@ class AIAgent:
         """Handle an action directive and update the response."""
         try:
             action_feedback = None
-            logger.info(f"Processing action: {action}")
+            logger.info("Processing action: %s", action)
             
             # Handle event actions
             if action['type'] == 'event':
@@ -1118,29 +1382,29 @@ class AIAgent:
                             source_link=event_details.get('source_link')
                         )
                         action_feedback = f"\n[✓ Created new event #{event_id}: {event_details['title']}]"
-                        logger.info(f"Created new event {event_id}. Details: {event_details}")
+                        logger.info("Created new event %s. Details: %s", event_id, event_details)
                     except json.JSONDecodeError as e:
-                        logger.error(f"Invalid event creation details: {e}")
+                        logger.error("Invalid event creation details: %s", e)
                         action_feedback = "\n[❌ Failed to create event - invalid format]"
                     except Exception as e:
-                        logger.error(f"Error creating event: {e}")
+                        logger.error("Error creating event: %s", e)
                         action_feedback = "\n[❌ Failed to create event]"
                 elif action['subtype'] == 'update':
                     try:
                         event_details = json.loads(action['details'])
                         update_event(action['event_id'], **event_details)
                         action_feedback = f"\n[✓ Updated event #{action['event_id']}]"
-                        logger.info(f"Updated event {action['event_id']}. Details: {event_details}")
+                        logger.info("Updated event %s. Details: %s", action['event_id'], event_details)
                     except Exception as e:
-                        logger.error(f"Error updating event: {e}")
+                        logger.error("Error updating event: %s", e)
                         action_feedback = "\n[❌ Failed to update event]"
                 elif action['subtype'] == 'delete':
                     try:
                         delete_event(action['event_id'])
                         action_feedback = f"\n[✓ Deleted event #{action['event_id']}]"
-                        logger.info(f"Deleted event {action['event_id']}")
+                        logger.info("Deleted event %s", action['event_id'])
                     except Exception as e:
-                        logger.error(f"Error deleting event: {e}")
+                        logger.error("Error deleting event: %s", e)
                         action_feedback = "\n[❌ Failed to delete event]"
 
             # Handle create_task action
@@ -1160,13 +1424,13 @@ class AIAgent:
                         await self.add_task_notes(task_id, notes)
                     
                     action_feedback = f"\n[✓ Created new task #{task_id}: {description}]"
-                    logger.info(f"Created new task {task_id}. Details: {task_details}")
+                    logger.info("Created new task %s. Details: %s", task_id, task_details)
                     
                 except json.JSONDecodeError as e:
-                    logger.error(f"Invalid task creation details: {e}")
+                    logger.error("Invalid task creation details: %s", e)
                     action_feedback = "\n[❌ Failed to create task - invalid format]"
                 except Exception as e:
-                    logger.error(f"Error creating task: {e}")
+                    logger.error("Error creating task: %s", e)
                     action_feedback = "\n[❌ Failed to create task]"
             
             # If we don't have a task_id but have details that look like a time specification
@@ -1184,17 +1448,17 @@ class AIAgent:
                     return response
                 
                 action['task_id'] = task['id']
-                logger.info(f"Using task ID {action['task_id']} for reminder")
+                logger.info("Using task ID %s for reminder", action['task_id'])
             
             if not action['task_id'] and action['type'] not in ['profile', 'explore', 'create_task']:
-                logger.error(f"No task ID provided for action: {action}")
+                logger.error("No task ID provided for action: %s", action)
                 return response
             
             if action['type'] == 'complete':
                 task_id = action['task_id']
                 update_task_status(task_id, 'completed', None)
                 action_feedback = f"\n[✓ Task #{task_id} has been marked as completed]"
-                logger.info(f"Task {task_id} marked as completed. Details: {action['details']}")
+                logger.info("Task %s marked as completed. Details: %s", task_id, action['details'])
                 
             elif action['type'] == 'remind':
                 task_id = action['task_id']
@@ -1214,25 +1478,25 @@ class AIAgent:
                     if isinstance(reminder_time, datetime):
                         time_str = reminder_time.strftime('%Y-%m-%d %H:%M')
                         action_feedback = f"\n[⏰ Reminder set for Task #{task_id} at {time_str}]"
-                        logger.info(f"Reminder set for task {task_id} at {time_str}")
+                        logger.info("Reminder set for task %s at %s", task_id, time_str)
                     else:
                         action_feedback = f"\n[⏰ Reminder set for Task #{task_id} at {reminder_time}]"
-                        logger.info(f"Special reminder set for task {task_id}: {reminder_time}")
+                        logger.info("Special reminder set for task %s: %s", task_id, reminder_time)
                 else:
                     action_feedback = f"\n[❌ Failed to set reminder for Task #{task_id} - invalid time format]"
-                    logger.error(f"Failed to parse reminder time for task {task_id}: {action['details']}")
+                    logger.error("Failed to parse reminder time for task %s: %s", task_id, action['details'])
                     
             elif action['type'] == 'help':
                 task_id = action['task_id']
                 update_task_status(task_id, 'half-completed', datetime.utcnow())
                 action_feedback = f"\n[📝 Task #{task_id} has been marked as in-progress]"
-                logger.info(f"Task {task_id} marked as in-progress. Help requested: {action['details']}")
+                logger.info("Task %s marked as in-progress. Help requested: %s", task_id, action['details'])
                 
             elif action['type'] == 'notes':
                 task_id = action['task_id']
                 await self.add_task_notes(task_id, action['details'])
                 action_feedback = f"\n[📝 Added note to Task #{task_id}]"
-                logger.info(f"Added note to task {task_id}: {action['details']}")
+                logger.info("Added note to task %s: %s", task_id, action['details'])
             
             elif action['type'] == 'draft_email':
                 task_id = action['task_id']
@@ -1252,9 +1516,9 @@ class AIAgent:
                         response
                     )
                     action_feedback = f"\n[📧 Email draft created for Task #{task_id}]"
-                    logger.info(f"Email draft created for task {task_id}. Recipients: {email_details.get('to', 'Not specified')}")
+                    logger.info("Email draft created for task %s. Recipients: %s", task_id, email_details.get('to', 'Not specified'))
                 except (json.JSONDecodeError, TypeError) as e:
-                    logger.error(f"Invalid email details format for task {task_id}: {e}")
+                    logger.error("Invalid email details format for task %s: %s", task_id, e)
                     response = re.sub(r'\[ACTION:draft_email:[^\]]*\]', '', response)
                     action_feedback = f"\n[❌ Failed to create email draft - invalid format]"
                     
@@ -1275,7 +1539,7 @@ class AIAgent:
                         )
                         if insight:
                             action_feedback = f"\n[👤 Profile updated: {insight}]"
-                            logger.info(f"Profile updated with new insight: {insight}")
+                            logger.info("Profile updated with new insight: %s", insight)
                         else:
                             action_feedback = "\n[👤 Profile updated]"
                             logger.info("Profile updated without new insights")
@@ -1286,7 +1550,7 @@ class AIAgent:
                             is_direct_input=False
                         )
                         action_feedback = f"\n[👤 Added preference to profile]"
-                        logger.info(f"Added user preference to profile: {details}")
+                        logger.info("Added user preference to profile: %s", details)
                     elif 'goal' in action['subtype']:
                         # Add user goal
                         profile, insight = await profile_manager.process_input(
@@ -1294,16 +1558,16 @@ class AIAgent:
                             is_direct_input=False
                         )
                         action_feedback = f"\n[👤 Added goal to profile]"
-                        logger.info(f"Added user goal to profile: {details}")
+                        logger.info("Added user goal to profile: %s", details)
                     
                 except Exception as e:
-                    logger.error(f"Error handling profile action: {str(e)}")
+                    logger.error("Error handling profile action: %s", e)
                     action_feedback = "\n[❌ Failed to update profile]"
                     
             elif action['type'] == 'explore':
                 task_id = action['task_id']
                 action_feedback = f"\n[🔍 Exploring details for Item #{task_id}]"
-                logger.info(f"Exploring item {task_id}. Details: {action['details']}")
+                logger.info("Exploring item %s. Details: %s", task_id, action['details'])
             
             # Remove any remaining action directives from the response
             response = re.sub(r'\[ACTION:[^\]]*\]', '', response).strip()
@@ -1311,12 +1575,12 @@ class AIAgent:
             # Add action feedback if available
             if action_feedback:
                 response += action_feedback
-                logger.info(f"Action completed successfully: {action['type']}")
+                logger.info("Action completed successfully: %s", action['type'])
             
             return response
             
         except Exception as e:
-            logger.error(f"Error handling action: {str(e)}")
+            logger.error("Error handling action: %s", e)
             # If there's an error, just return the response without the action directives
             return re.sub(r'\[ACTION:[^\]]*\]', '', response).strip()
 
@@ -1347,15 +1611,15 @@ class AIAgent:
         4. Include clear next steps or expectations
         5. Format with proper email structure (To, Subject, Body)"""
 
-        email = ""
+        email_chunks = []
         async for chunk in self.chatgpt.process(prompt, {
             "role": "email_drafter",
             "style": "professional",
             "focus": "clarity"
         }):
-            email += chunk
+            email_chunks.append(chunk)
         
-        return email
+        return "".join(email_chunks)
 
     def _parse_reminder_time(self, time_str: str) -> Optional[datetime]:
         """Parse a reminder time string into a datetime."""
@@ -1393,5 +1657,5 @@ class AIAgent:
             return get_events_by_timeframe(start_time, end_time)
             
         except Exception as e:
-            logger.error(f"Error retrieving events: {str(e)}")
+            logger.error("Error retrieving events: %s", e)
             raise 
\ No newline at end of file
@@ -16,6 +16,7 @@ from database import (
     get_db,
     DatabaseError,
     get_tasks_by_urgency,
+    get_all_tasks_prioritized,
     update_task_status,
     create_task,
     get_task_by_id,
@@ -28,6 +29,7 @@ from database import (
     delete_event
 )
 from server_config import server_config
+from config import HALF_FINISHED_PRIORITY
 from o3_mini import O3MiniAgent
 from profile_manager import ProfileManager
 from linkedin_manager import LinkedInManager
@@ -197,18 +199,23 @@ class EventResponse(EventBase):
     class Config:
         from_attributes = True
 
+@app.on_event("shutdown")
+async def shutdown_agent():
+    """Stop the agent's background tasks."""
+    await agent.aclose()
+
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
     """Log all incoming requests."""
-    logger.info(f"Request: {request.method} {request.url}")
+    logger.info("Request: %s %s", request.method, request.url)
     response = await call_next(request)
-    logger.info(f"Response status: {response.status_code}")
+    logger.info("Response status: %s", response.status_code)
     return response
 
 @app.exception_handler(DatabaseError)
 async def database_error_handler(request: Request, exc: DatabaseError):
     """Handle database errors."""
-    logger.error(f"Database error: {str(exc)}")
+    logger.error("Database error: %s", exc)
     return JSONResponse(
         status_code=500,
         content={"detail": "Database operation failed"}
@@ -219,7 +226,7 @@ async def process_input(user_input: UserInput):
     """
     Process user input and return the agent's response.
     """
-    logger.info(f"Processing input: {user_input.text[:100]}...")
+    logger.info("Processing input: %s...", user_input.text[:100])
     try:
         # Collect all chunks from the async generator
         response_chunks = []
@@ -234,7 +241,7 @@ async def process_input(user_input: UserInput):
             model_used=agent.last_model_used
         )
     except Exception as e:
-        logger.error(f"Error processing input: {str(e)}")
+        logger.error("Error processing input: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/tasks", response_model=TaskSummary)
@@ -250,25 +257,16 @@ async def get_tasks(urgency: Optional[int] = None):
         if urgency is not None:
             tasks = get_tasks_by_urgency(urgency)
         else:
-            all_tasks = []
-            for level in range(5, 0, -1):
-                tasks = get_tasks_by_urgency(level)
-                all_tasks.extend(tasks)
-            tasks = all_tasks
+            tasks = get_all_tasks_prioritized(HALF_FINISHED_PRIORITY, include_completed=True)
 
         # Chunk and summarize tasks
-        task_chunks = agent._chunk_tasks(tasks)
-        summaries = []
-        for chunk in task_chunks:
-            chunk_text = agent._format_tasks_for_summary(chunk)
-            summary = await agent.chatgpt.summarize_tasks(chunk_text)
-            summaries.append(summary)
+        summaries = await agent.summarize_tasks(tasks)
 
         return TaskSummary(summaries=summaries)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Error getting tasks: {str(e)}")
+        logger.error("Error getting tasks: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/tasks", status_code=201)
@@ -287,7 +285,7 @@ async def create_new_task(task_data: TaskCreate):
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Error creating task: {str(e)}")
+        logger.error("Error creating task: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/tasks/{task_id}")
@@ -303,7 +301,7 @@ async def get_task(task_id: int):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error getting task: {str(e)}")
+        logger.error("Error getting task: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/tasks/{task_id}/status")
@@ -327,7 +325,7 @@ async def update_task(task_update: TaskUpdate):
         # Will be handled by the database_error_handler
         raise
     except Exception as e:
-        logger.error(f"Error updating task: {str(e)}")
+        logger.error("Error updating task: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/tasks/{task_id}/urgency")
@@ -346,7 +344,7 @@ async def update_task_urgency_endpoint(task_update: TaskUrgencyUpdate):
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Error updating task urgency: {str(e)}")
+        logger.error("Error updating task urgency: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/tasks/{task_id}/notes")
@@ -363,7 +361,7 @@ async def append_task_notes_endpoint(notes_update: TaskNotesUpdate):
         append_task_notes(notes_update.task_id, notes_update.notes)
         return {"message": f"Notes appended to task {notes_update.task_id} successfully"}
     except Exception as e:
-        logger.error(f"Error appending task notes: {str(e)}")
+        logger.error("Error appending task notes: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.put("/tasks/{task_id}/description")
@@ -380,7 +378,7 @@ async def update_task_description_endpoint(desc_update: TaskDescriptionUpdate):
         update_task_description(desc_update.task_id, desc_update.description)
         return {"message": f"Task {desc_update.task_id} description updated successfully"}
     except Exception as e:
-        logger.error(f"Error updating task description: {str(e)}")
+        logger.error("Error updating task description: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/profile", response_model=ProfileResponse)
@@ -395,7 +393,7 @@ async def update_profile(profile_input: ProfileInput):
         )
         return ProfileResponse(profile=profile, insight=insight)
     except Exception as e:
-        logger.error(f"Error updating profile: {str(e)}")
+        logger.error("Error updating profile: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/profile", response_model=Dict[str, Any])
@@ -407,7 +405,7 @@ async def get_profile():
         profile = await profile_manager.get_profile()
         return profile
     except Exception as e:
-        logger.error(f"Error getting profile: {str(e)}")
+        logger.error("Error getting profile: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/profile/raw", response_model=Optional[RawProfile])
@@ -423,7 +421,7 @@ async def get_raw_profile():
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error getting raw profile: {str(e)}")
+        logger.error("Error getting raw profile: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/profile")
@@ -437,7 +435,7 @@ async def clear_profile():
             raise HTTPException(status_code=500, detail="Failed to clear profile")
         return {"message": "Profile cleared successfully"}
     except Exception as e:
-        logger.error(f"Error clearing profile: {str(e)}")
+        logger.error("Error clearing profile: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/think_deep", response_model=ThinkDeepResponse)
@@ -455,7 +453,7 @@ async def think_deep(request: ThinkDeepRequest):
         result = await o3_mini.think_deep(request.prompt)
         return ThinkDeepResponse(result=result)
     except Exception as e:
-        logger.error(f"Error in deep thinking: {str(e)}")
+        logger.error("Error in deep thinking: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/health")
@@ -472,7 +470,7 @@ async def health_check():
             "timestamp": datetime.utcnow().isoformat()
         }
     except Exception as e:
-        logger.error(f"Health check failed: {str(e)}")
+        logger.error("Health check failed: %s", e)
         return JSONResponse(
             status_code=503,
             content={
@@ -491,7 +489,7 @@ async def update_profile_from_linkedin(token: LinkedInToken):
         profile, insight = await linkedin_manager.process_linkedin_profile(token.access_token)
         return ProfileResponse(profile=profile, insight=insight)
     except Exception as e:
-        logger.error(f"Error updating profile from LinkedIn: {str(e)}")
+        logger.error("Error updating profile from LinkedIn: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/gmail/auth", response_model=GmailAuthResponse)
@@ -507,7 +505,7 @@ async def start_gmail_auth(user_token: UserToken):
             state=flow.state
         )
     except Exception as e:
-        logger.error(f"Error starting Gmail auth: {str(e)}")
+        logger.error("Error starting Gmail auth: %s", e)
         raise HTTPException(status_code=500, detail="Failed to start Gmail authentication")
 
 @app.get("/gmail/status", response_model=GmailAuthStatus)
@@ -524,7 +522,7 @@ async def get_gmail_status(user_token: str = Header(...)):
             last_sync=status.get('last_sync')
         )
     except Exception as e:
-        logger.error(f"Error checking Gmail status: {str(e)}")
+        logger.error("Error checking Gmail status: %s", e)
         raise HTTPException(status_code=500, detail="Failed to check Gmail status")
 
 @app.post("/gmail/revoke")
@@ -536,7 +534,7 @@ async def revoke_gmail_access(user_token: str = Header(...)):
         await revoke_gmail_credentials(user_token)
         return {"message": "Gmail access revoked successfully"}
     except Exception as e:
-        logger.error(f"Error revoking Gmail access: {str(e)}")
+        logger.error("Error revoking Gmail access: %s", e)
         raise HTTPException(status_code=500, detail="Failed to revoke Gmail access")
 
 @app.post("/gmail/callback", response_model=Dict[str, str])
@@ -561,7 +559,7 @@ async def gmail_auth_callback(callback_data: GmailAuthCallback, user_token: str
             "email": email
         }
     except Exception as e:
-        logger.error(f"Error in Gmail callback: {str(e)}")
+        logger.error("Error in Gmail callback: %s", e)
         raise HTTPException(status_code=500, detail="Failed to complete Gmail authentication")
 
 @app.post("/gmail/process", response_model=GmailProcessResponse)
@@ -588,7 +586,7 @@ async def process_gmail(background_tasks: BackgroundTasks, user_token: str = Hea
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error starting Gmail processing: {str(e)}")
+        logger.error("Error starting Gmail processing: %s", e)
         raise HTTPException(status_code=500, detail="Failed to start Gmail processing")
 
 async def process_gmail_background(user_token: str):
@@ -609,10 +607,10 @@ async def process_gmail_background(user_token: str):
         tasks = [item for item in created_items if item['type'] == 'task']
         opportunities = [item for item in created_items if item['type'] == 'opportunity']
         
-        logger.info(f"Gmail processing complete. Created {len(tasks)} tasks and {len(opportunities)} opportunities")
+        logger.info("Gmail processing complete. Created %s tasks and %s opportunities", len(tasks), len(opportunities))
         
     except Exception as e:
-        logger.error(f"Error in background Gmail processing: {str(e)}")
+        logger.error("Error in background Gmail processing: %s", e)
 
 @app.post("/chat/clear", response_model=ClearChatResponse)
 async def clear_chat(user_token: str = Header(...)):
@@ -647,7 +645,7 @@ async def clear_chat(user_token: str = Header(...)):
             )
             
     except Exception as e:
-        logger.error(f"Error clearing chat history: {str(e)}")
+        logger.error("Error clearing chat history: %s", e)
         raise HTTPException(status_code=500, detail="Failed to clear chat history")
 
 @app.post("/events", response_model=EventResponse)
@@ -677,7 +675,7 @@ async def create_new_event(event: EventCreate):
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Error creating event: {str(e)}")
+        logger.error("Error creating event: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/events/{event_id}", response_model=EventResponse)
@@ -692,7 +690,7 @@ async def get_event(event_id: int):
                 raise HTTPException(status_code=404, detail="Event not found")
             return event
     except Exception as e:
-        logger.error(f"Error getting event: {str(e)}")
+        logger.error("Error getting event: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/events", response_model=List[EventResponse])
@@ -714,7 +712,7 @@ async def get_events(
         events = get_events_by_timeframe(start, end)
         return events
     except Exception as e:
-        logger.error(f"Error getting events: {str(e)}")
+        logger.error("Error getting events: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.put("/events/{event_id}", response_model=EventResponse)
@@ -736,7 +734,7 @@ async def update_event_endpoint(event_id: int, event_update: EventUpdate):
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Error updating event: {str(e)}")
+        logger.error("Error updating event: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/events/{event_id}")
@@ -748,7 +746,7 @@ async def delete_event_endpoint(event_id: int):
         delete_event(event_id)
         return {"message": f"Event {event_id} deleted successfully"}
     except Exception as e:
-        logger.error(f"Error deleting event: {str(e)}")
+        logger.error("Error deleting event: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 def start_api():
@@ -2,6 +2,7 @@
 ChatGPT-4 integration and prompt management.
 """
 from typing import Optional, Dict, Any, AsyncGenerator
+import functools
 import logging
 from openai import AsyncOpenAI
 import json
@@ -21,7 +22,11 @@ class ChatGPTAgent:
         else:
             self.client = AsyncOpenAI(api_key=OPENAI_API_KEY)
             self.is_available = True
-            self.o3_mini = O3MiniAgent()  # Initialize O3MiniAgent
+
+    @functools.cached_property
+    def o3_mini(self) -> O3MiniAgent:
+        """The O3-mini model used for deep thinking, created on first use."""
+        return O3MiniAgent()
 
     def _is_action_directive(self, text: str) -> bool:
         """Check if text is part of an action directive."""
@@ -70,8 +75,8 @@ class ChatGPTAgent:
         try:
             if deep_thinking and self.o3_mini.is_available:
                 # Use O3-mini for deep thinking tasks
-                async for chunk in self.o3_mini.think_deep(user_input):
-                    yield chunk
+                async for piece in self.o3_mini.think_deep(user_input):
+                    yield piece
 
             messages = self._prepare_messages(user_input, context)
             
@@ -182,6 +187,42 @@ class ChatGPTAgent:
             logger.error(f"Error generating action prompt: {str(e)}")
             raise
 
+    async def summarize_tasks(self, tasks_text: str) -> AsyncGenerator[str, None]:
+        """
+        Summarize a chunk of formatted tasks.
+        
+        Args:
+            tasks_text (str): Tasks formatted by AIAgent._format_tasks_for_summary
+        
+        Returns:
+            AsyncGenerator[str, None]: Summary chunks
+        """
+        if not self.is_available:
+            raise RuntimeError("ChatGPT functionality is not available.")
+
+        system_prompt = """You are a proactive task management assistant.
+        Summarize the user's tasks briefly, highlighting what is most urgent
+        and anything that is already in progress."""
+
+        try:
+            stream = await self.client.chat.completions.create(
+                model=GPT4_MODEL,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": f"Summarize these tasks:\n\n{tasks_text}"}
+                ],
+                temperature=TEMPERATURE,
+                stream=True
+            )
+            
+            async for chunk in stream:
+                if chunk.choices[0].delta.content is not None:
+                    yield chunk.choices[0].delta.content
+
+        except Exception as e:
+            logger.error(f"Error summarizing tasks: {str(e)}")
+            raise
+
     def _prepare_messages(self, user_input: str, context: Optional[Dict[str, Any]] = None) -> list:
         """
         Prepare the messages for the ChatGPT API.
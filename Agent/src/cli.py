@@ -170,6 +170,8 @@ class AgentCLI:
         except Exception as e:
             logger.error(f"Error during initial greeting: {str(e)}")
             print("\nAI: Hello! I encountered a small issue getting started, but I'm ready to help now.")
+        finally:
+            await self.agent.aclose()
 
     async def _handle_profile_command(self):
         """Handle the profile command and its subcommands."""
@@ -81,10 +81,17 @@ LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 MAX_RETRIES = int(get_optional_env("MAX_RETRIES", "3"))
 TIMEOUT = int(get_optional_env("TIMEOUT", "30"))
 TEMPERATURE = float(get_optional_env("TEMPERATURE", "0.7"))
+WRITE_BATCH_SIZE = int(get_optional_env("WRITE_BATCH_SIZE", "50"))  # Maximum log rows committed per transaction
+WRITE_FLUSH_MS = int(get_optional_env("WRITE_FLUSH_MS", "50"))  # Milliseconds to wait for a write batch to fill
+RESPONSE_CACHE_SIZE = int(get_optional_env("RESPONSE_CACHE_SIZE", "128"))  # Responses kept for repeated non-chat inputs
+FALLBACK_HEDGE_DELAY = float(get_optional_env("FALLBACK_HEDGE_DELAY", "0"))  # Seconds to wait for the first chunk before also starting the fallback model (0 disables)
 
 # Task Processing Configuration
 MAX_TOKENS = int(get_optional_env("MAX_TOKENS", "1000"))  # Maximum tokens per task chunk
 MAX_EMAILS = int(get_optional_env("MAX_EMAILS", "5"))  # Maximum emails/tasks per chunk
+MAX_CONCURRENT_SUMMARIES = int(get_optional_env("MAX_CONCURRENT_SUMMARIES", "4"))  # Chunk summaries in flight at once
+STREAM_FLUSH_INTERVAL = float(get_optional_env("STREAM_FLUSH_INTERVAL", "0.05"))  # Seconds between stdout flushes while streaming
+STREAM_FLUSH_CHARS = int(get_optional_env("STREAM_FLUSH_CHARS", "256"))  # Buffered characters that force a stdout flush
 URGENCY_ORDER = [5, 4, 3, 2, 1]  # Process tasks in order of urgency (5 highest)
 HALF_FINISHED_PRIORITY = 3  # Priority level for half-finished tasks
 HIGH_PRIORITY_URGENCY_LEVELS = [5, 4, 3]  # Urgency levels considered high priority for task summaries 
\ No newline at end of file
@@ -166,6 +166,45 @@ def get_tasks_by_urgency(urgency_level: int) -> List[Dict[str, Any]]:
     except DatabaseError as e:
         raise DatabaseError(f"Failed to get tasks: {str(e)}")
 
+def get_all_tasks_prioritized(half_finished_priority: int, include_completed: bool = False) -> List[Dict[str, Any]]:
+    """
+    Retrieve all tasks in a single query, ordered by priority.
+    
+    Half-completed tasks are ranked at no lower than half_finished_priority
+    and ahead of other tasks of the same rank.
+    
+    Args:
+        half_finished_priority (int): Minimum urgency rank for half-completed tasks
+        include_completed (bool): Whether to include completed tasks
+    
+    Returns:
+        List[Dict[str, Any]]: List of tasks as dictionaries
+    
+    Raises:
+        DatabaseError: If database operation fails
+    """
+    where_clause = "" if include_completed else "WHERE status != 'completed'"
+    query = text(f"""
+        SELECT id, description, urgency, status, alertAt 
+        FROM tasks 
+        {where_clause}
+        ORDER BY
+            CASE
+                WHEN status = 'half-completed' AND urgency < :half_finished_priority
+                THEN :half_finished_priority
+                ELSE urgency
+            END DESC,
+            CASE WHEN status = 'half-completed' THEN 0 ELSE 1 END,
+            CASE WHEN alertAt IS NULL THEN 1 ELSE 0 END, alertAt DESC
+    """)
+    
+    try:
+        with get_db() as db:
+            result = db.execute(query, {"half_finished_priority": half_finished_priority})
+            return [dict(row) for row in result.mappings()]
+    except DatabaseError as e:
+        raise DatabaseError(f"Failed to get tasks: {str(e)}")
+
 def update_task_status(task_id: int, status: str, alert_at: Optional[datetime] = None) -> None:
     """
     Update task status and alert time.
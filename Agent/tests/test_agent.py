@@ -1,6 +1,7 @@
 """
 Tests for the main AI agent functionality using unittest framework.
 """
+import asyncio
 import pytest
 from unittest.mock import patch, MagicMock, AsyncMock
 from datetime import datetime
@@ -9,6 +10,26 @@ from Agent.agent import AIAgent
 from Agent.config import MAX_EMAILS, MAX_TOKENS
 from Agent.database import SessionLocal, init_db, engine, Base
 
+class FakeModel:
+    """Stand-in for a streaming model agent."""
+    def __init__(self, chunks=("response",), error=None, delay=0):
+        self.chunks = chunks
+        self.error = error
+        self.delay = delay
+        self.cancelled = False
+        self.is_available = True
+
+    async def process(self, user_input, context=None):
+        try:
+            await asyncio.sleep(self.delay)
+            if self.error:
+                raise self.error
+            for chunk in self.chunks:
+                yield chunk
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
 class TestAIAgent:
     @pytest.fixture(autouse=True)
     def setup_method(self):
@@ -49,6 +70,22 @@ class TestAIAgent:
         assert len(chunks) > 1
         assert len(chunks[0]) <= MAX_EMAILS
     
+    def test_chunk_tasks_token_limit(self):
+        """Test chunking tasks when descriptions exceed MAX_TOKENS."""
+        long_task = {'id': 6, 'description': 'x' * (MAX_TOKENS * 4), 'urgency': 5, 'status': 'pending'}
+        chunks = self.agent._chunk_tasks([long_task] + self.sample_tasks[:2])
+        
+        assert len(chunks) == 2
+        assert chunks[0] == [long_task]
+        assert len(chunks[1]) == 2
+    
+    def test_chunk_tasks_non_positive_email_limit(self):
+        """Test that a MAX_EMAILS below one still makes progress."""
+        with patch('Agent.agent.MAX_EMAILS', 0):
+            chunks = self.agent._chunk_tasks(self.sample_tasks[:3])
+        
+        assert chunks == [[task] for task in self.sample_tasks[:3]]
+    
     def test_chunk_tasks_empty(self):
         """Test chunking with empty task list."""
         chunks = self.agent._chunk_tasks([])
@@ -102,11 +139,277 @@ class TestAIAgent:
                 # Verify task status was updated
                 mock_update.assert_called_with(1, 'completed', None)
     
+    @pytest.mark.asyncio
+    async def test_summarize_tasks_keeps_chunk_order(self):
+        """Test that concurrent chunk summaries are returned in chunk order."""
+        async def mock_summary_gen(chunk_text):
+            yield chunk_text.splitlines()[0]
+        
+        tasks = self.sample_tasks * 2
+        with patch.object(self.agent.chatgpt, 'summarize_tasks', side_effect=mock_summary_gen):
+            summaries = await self.agent.summarize_tasks(tasks)
+        
+        chunks = self.agent._chunk_tasks(tasks)
+        assert len(summaries) == len(chunks)
+        for summary, chunk in zip(summaries, chunks):
+            assert summary == f"Task {chunk[0]['id']}: {chunk[0]['description']}"
+    
+    @pytest.mark.asyncio
+    async def test_run_with_fallback_primary_succeeds(self):
+        """Test that a successful primary is used without starting the fallback."""
+        fallback = FakeModel(("fallback",))
+        response, model_used = await self.agent._run_with_fallback(
+            "Test input", {}, [(lambda: FakeModel(("primary ", "answer")), "o3-mini"), (lambda: fallback, "gpt-4")]
+        )
+        
+        assert (response, model_used) == ("primary answer", "o3-mini")
+        assert not fallback.cancelled
+    
+    @pytest.mark.asyncio
+    async def test_run_with_fallback_does_not_create_unused_fallback(self):
+        """Test that the fallback model is only created when it is started."""
+        get_fallback = MagicMock(return_value=FakeModel(("fallback",)))
+        response, model_used = await self.agent._run_with_fallback(
+            "Test input", {}, [(lambda: FakeModel(("primary",)), "gpt-4"), (get_fallback, "o3-mini")]
+        )
+        
+        assert (response, model_used) == ("primary", "gpt-4")
+        get_fallback.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_run_with_fallback_primary_fails(self):
+        """Test that the fallback answers when the primary raises."""
+        response, model_used = await self.agent._run_with_fallback(
+            "Test input", {}, [(lambda: FakeModel(error=RuntimeError("down")), "o3-mini"), (lambda: FakeModel(("fallback",)), "gpt-4")]
+        )
+        
+        assert (response, model_used) == ("fallback", "gpt-4")
+    
+    @pytest.mark.asyncio
+    async def test_run_with_fallback_primary_empty(self):
+        """Test that the fallback answers when the primary returns nothing."""
+        response, model_used = await self.agent._run_with_fallback(
+            "Test input", {}, [(lambda: FakeModel(()), "o3-mini"), (lambda: FakeModel(("fallback",)), "gpt-4")]
+        )
+        
+        assert (response, model_used) == ("fallback", "gpt-4")
+    
+    @pytest.mark.asyncio
+    async def test_run_with_fallback_single_model(self):
+        """Test running with a single available model."""
+        response, model_used = await self.agent._run_with_fallback(
+            "Test input", {}, [(lambda: FakeModel(("only",)), "gpt-4")]
+        )
+        assert (response, model_used) == ("only", "gpt-4")
+        
+        with pytest.raises(RuntimeError):
+            await self.agent._run_with_fallback(
+                "Test input", {}, [(lambda: FakeModel(error=RuntimeError("down")), "gpt-4")]
+            )
+    
+    @pytest.mark.asyncio
+    async def test_run_with_fallback_slow_primary_not_hedged_by_default(self):
+        """Test that a slow primary is waited for when hedging is disabled."""
+        fallback = FakeModel(("fallback",))
+        with patch('Agent.agent.FALLBACK_HEDGE_DELAY', 0):
+            response, model_used = await self.agent._run_with_fallback(
+                "analyze this", {}, [(lambda: FakeModel(("deep answer",), delay=0.05), "o3-mini"), (lambda: fallback, "gpt-4")]
+            )
+        
+        assert (response, model_used) == ("deep answer", "o3-mini")
+    
+    @pytest.mark.asyncio
+    async def test_run_with_fallback_cancels_loser(self):
+        """Test that a hedged fallback winning the race cancels the primary."""
+        primary = FakeModel(("primary",), delay=1)
+        with patch('Agent.agent.FALLBACK_HEDGE_DELAY', 0.01):
+            response, model_used = await self.agent._run_with_fallback(
+                "Test input", {}, [(lambda: primary, "o3-mini"), (lambda: FakeModel(("fallback",)), "gpt-4")]
+            )
+        await asyncio.sleep(0)  # Let the cancellation reach the primary
+        
+        assert (response, model_used) == ("fallback", "gpt-4")
+        assert primary.cancelled
+    
+    async def _cached_turn(self, user_input, context=None):
+        """Run process_input with stub models and return the joined response."""
+        context = {"is_greeting": False} if context is None else context
+        with patch('Agent.agent.ProfileManager') as mock_profile_manager:
+            mock_profile_manager.return_value.process_input = AsyncMock(return_value=(None, None))
+            return "".join([chunk async for chunk in self.agent.process_input(user_input, context)])
+    
+    def _stub_models(self):
+        """Replace the agent's models and fallback runner with stubs."""
+        self.agent.chatgpt = FakeModel()
+        self.agent.o3_mini = FakeModel()
+        self.agent._queue_write = MagicMock()
+        self.agent._run_with_fallback = AsyncMock(side_effect=lambda user_input, context, models: (f"answer to {user_input}", models[0][1]))
+    
+    @pytest.mark.asyncio
+    async def test_process_input_cache_hit_skips_model(self):
+        """Test that a repeated input is answered from the cache."""
+        self._stub_models()
+        
+        first = await self._cached_turn("Test input")
+        second = await self._cached_turn("Test input")
+        
+        assert first == second == "answer to Test input"
+        self.agent._run_with_fallback.assert_called_once()
+    
+    @pytest.mark.asyncio
+    async def test_process_input_cache_hit_skips_profile_analysis(self):
+        """Test that a cache hit answers without running profile analysis."""
+        self._stub_models()
+        with patch('Agent.agent.ProfileManager') as mock_profile_manager:
+            mock_profile_manager.return_value.process_input = AsyncMock(return_value=(None, None))
+            for _ in range(2):
+                response = "".join([chunk async for chunk in self.agent.process_input("Test input", {"is_greeting": False})])
+                assert response == "answer to Test input"
+        
+        mock_profile_manager.assert_called_once()
+        mock_profile_manager.return_value.process_input.assert_awaited_once()
+        self.agent._run_with_fallback.assert_called_once()
+        assert self.agent._queue_write.call_count == 4  # Both turns are still logged
+    
+    @pytest.mark.asyncio
+    async def test_process_input_cache_restores_model_used(self):
+        """Test that a cache hit restores the model that produced the response."""
+        self._stub_models()
+        
+        await self._cached_turn("analyze this")
+        assert self.agent.last_model_used == "o3-mini"
+        await self._cached_turn("Test input")
+        assert self.agent.last_model_used == "gpt-4"
+        await self._cached_turn("analyze this")
+        
+        assert self.agent.last_model_used == "o3-mini"
+        assert self.agent._run_with_fallback.call_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_process_input_cache_evicts_least_recently_used(self):
+        """Test that the cache drops the least recently used entry when full."""
+        self._stub_models()
+        with patch('Agent.agent.RESPONSE_CACHE_SIZE', 2):
+            await self._cached_turn("first")
+            await self._cached_turn("second")
+            await self._cached_turn("first")  # Hit, so "second" is now the oldest
+            await self._cached_turn("third")
+            assert len(self.agent._resp_cache) == 2
+            
+            await self._cached_turn("first")
+            assert self.agent._run_with_fallback.call_count == 3
+            await self._cached_turn("second")
+            assert self.agent._run_with_fallback.call_count == 4
+    
+    @pytest.mark.asyncio
+    async def test_process_input_does_not_cache_chat_turns(self):
+        """Test that turns with conversation history are never cached."""
+        self._stub_models()
+        context = {"is_greeting": False, "history": [{"role": "user", "content": "Hi"}]}
+        
+        await self._cached_turn("Test input", context)
+        await self._cached_turn("Test input", context)
+        
+        assert self.agent._run_with_fallback.call_count == 2
+        assert not self.agent._resp_cache
+    
+    def _written_batches(self):
+        """Return the rows of each batch passed to the stubbed _write_rows."""
+        return [[row for _, row in call.args[0]] for call in self.agent._write_rows.call_args_list]
+    
+    @pytest.mark.asyncio
+    async def test_writer_batches_by_size(self):
+        """Test that the writer commits at most WRITE_BATCH_SIZE rows at a time."""
+        self.agent._write_rows = MagicMock()
+        with patch('Agent.agent.WRITE_BATCH_SIZE', 2), patch('Agent.agent.WRITE_FLUSH_MS', 1000):
+            for i in range(5):
+                self.agent._queue_write("conversations", {"id": i})
+            await self.agent._write_queue.join()
+        await self.agent.aclose()
+        
+        assert self._written_batches() == [[{"id": 0}, {"id": 1}], [{"id": 2}, {"id": 3}], [{"id": 4}]]
+    
+    @pytest.mark.asyncio
+    async def test_writer_batches_by_flush_window(self):
+        """Test that rows queued after the flush window go in a new batch."""
+        self.agent._write_rows = MagicMock()
+        with patch('Agent.agent.WRITE_FLUSH_MS', 10):
+            self.agent._queue_write("conversations", {"id": 1})
+            self.agent._queue_write("conversations", {"id": 2})
+            await asyncio.sleep(0.05)
+            self.agent._queue_write("conversations", {"id": 3})
+            await self.agent._write_queue.join()
+        await self.agent.aclose()
+        
+        assert self._written_batches() == [[{"id": 1}, {"id": 2}], [{"id": 3}]]
+    
+    def test_write_rows_groups_by_table(self):
+        """Test that a batch is inserted with one statement per table in one transaction."""
+        conversations, agent_tasks = MagicMock(), MagicMock()
+        with patch('Agent.agent.engine') as mock_engine:
+            AIAgent._write_rows([
+                (conversations, {"id": 1}),
+                (agent_tasks, {"id": 2}),
+                (conversations, {"id": 3})
+            ])
+        
+        mock_engine.begin.assert_called_once()
+        conn = mock_engine.begin.return_value.__enter__.return_value
+        assert conn.execute.call_args_list == [
+            ((conversations.insert.return_value, [{"id": 1}, {"id": 3}]),),
+            ((agent_tasks.insert.return_value, [{"id": 2}]),)
+        ]
+    
+    @pytest.mark.asyncio
+    async def test_writer_survives_failed_batch(self):
+        """Test that a failed batch is logged and later batches are still written."""
+        self.agent._write_rows = MagicMock(side_effect=[RuntimeError("db down"), None])
+        with patch('Agent.agent.WRITE_FLUSH_MS', 1), patch('Agent.agent.logger') as mock_logger:
+            self.agent._queue_write("conversations", {"id": 1})
+            await self.agent._write_queue.join()
+            self.agent._queue_write("conversations", {"id": 2})
+            await self.agent._write_queue.join()
+        await self.agent.aclose()
+        
+        mock_logger.error.assert_called_once()
+        assert self._written_batches() == [[{"id": 1}], [{"id": 2}]]
+    
+    @pytest.mark.asyncio
+    async def test_aclose_drains_write_queue(self):
+        """Test that aclose writes every queued row before stopping the writer."""
+        self.agent._write_rows = MagicMock()
+        for i in range(3):
+            self.agent._queue_write("conversations", {"id": i})
+        writer = self.agent._writer_task
+        await self.agent.aclose()
+        await asyncio.sleep(0)  # Let the cancellation reach the writer
+        
+        assert self._written_batches() == [[{"id": 0}, {"id": 1}, {"id": 2}]]
+        assert writer.done()
+    
+    def test_queue_write_keeps_rows_across_event_loops(self):
+        """Test that rows left on a finished event loop are written by the next writer."""
+        self.agent._write_rows = MagicMock()
+        
+        async def queue_row():
+            self.agent._queue_write("conversations", {"id": 1})
+        
+        async def queue_row_and_close():
+            self.agent._queue_write("conversations", {"id": 2})
+            await self.agent.aclose()
+        
+        asyncio.run(queue_row())  # The loop ends before its writer runs
+        asyncio.run(queue_row_and_close())
+        
+        assert self._written_batches() == [[{"id": 1}, {"id": 2}]]
+    
     def test_requires_deep_thinking(self):
         """Test the deep thinking detection logic."""
         # Should return True for analytical keywords
         assert self.agent._requires_deep_thinking("analyze this problem")
         assert self.agent._requires_deep_thinking("compare these options")
+        assert self.agent._requires_deep_thinking("Please Evaluate the results")
+        assert self.agent._requires_deep_thinking("we analyzed it yesterday")
         
         # Should return False for simple queries
         assert not self.agent._requires_deep_thinking("what time is it")
@@ -5,8 +5,11 @@ import unittest
 from unittest.mock import patch, MagicMock
 from datetime import datetime
 
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
 from Agent.database import (
-    get_tasks_by_urgency, update_task_status,
+    get_tasks_by_urgency, get_all_tasks_prioritized, update_task_status,
     Conversation, AgentTask, Task, init_db
 )
 
@@ -42,6 +45,30 @@ class TestDatabaseOperations(unittest.TestCase):
         # Verify SQL execution
         fake_connection.__enter__.return_value.execute.assert_called_once()
     
+    def test_get_all_tasks_prioritized(self):
+        """Test retrieving all tasks in priority order with a single query."""
+        # Run the raw query against a real in-memory database
+        sqlite_engine = create_engine("sqlite://")
+        Task.__table__.create(sqlite_engine)
+        with sqlite_engine.begin() as conn:
+            conn.execute(Task.__table__.insert(), [
+                {'id': 1, 'description': 'Low', 'urgency': 2, 'status': 'pending', 'alertAt': None},
+                {'id': 2, 'description': 'Half done', 'urgency': 2, 'status': 'half-completed', 'alertAt': None},
+                {'id': 3, 'description': 'Medium', 'urgency': 3, 'status': 'pending', 'alertAt': None},
+                {'id': 4, 'description': 'Urgent', 'urgency': 5, 'status': 'pending', 'alertAt': None},
+                {'id': 5, 'description': 'Urgent with alert', 'urgency': 5, 'status': 'pending', 'alertAt': datetime(2024, 1, 1)},
+                {'id': 6, 'description': 'Done', 'urgency': 5, 'status': 'completed', 'alertAt': None}
+            ])
+        
+        with patch('Agent.database.SessionLocal', sessionmaker(bind=sqlite_engine)):
+            tasks = get_all_tasks_prioritized(3)
+            all_tasks = get_all_tasks_prioritized(3, include_completed=True)
+        
+        # Half-completed tasks are raised to rank 3 and come first within it
+        self.assertEqual([task['id'] for task in tasks], [5, 4, 2, 3, 1])
+        self.assertEqual(tasks[1], {'id': 4, 'description': 'Urgent', 'urgency': 5, 'status': 'pending', 'alertAt': None})
+        self.assertEqual(sorted(task['id'] for task in all_tasks), [1, 2, 3, 4, 5, 6])
+    
     @patch('Agent.database.engine.connect')
     def test_update_task_status(self, mock_connect):
         """Test updating task status and alert time."""